@@ -0,0 +1,119 @@
+from PIL import Image
+import numpy as np
+
+import hashlib
+import pathlib
+
+DEFAULT_HASH_SIZE = 8
+DEFAULT_NEAR_THRESHOLD = 6
+
+def content_hash(path, chunk_size=1024 * 1024):
+    """BLAKE2b digest of a file's bytes."""
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def dhash(path, hash_size=DEFAULT_HASH_SIZE):
+    """Difference hash: compares neighbouring pixels of a small grayscale thumbnail.
+
+    Re-scans, resized or recompressed copies of a page end up a few bits apart.
+    """
+    with Image.open(path) as image:
+        # lets JPEG decode at a reduced scale
+        image.draft('L', (hash_size * 8, hash_size * 8))
+        try:
+            import PIL.ImageOps
+            image = PIL.ImageOps.exif_transpose(image)
+        except AttributeError:
+            pass
+        pixels = np.asarray(image.convert('L').resize((hash_size + 1, hash_size), Image.BILINEAR), dtype=np.int16)
+
+    bits = (pixels[:, 1:] > pixels[:, :-1]).ravel()
+    return np.packbits(bits)
+
+class DuplicateIndex:
+    """Tracks images seen so far and reports exact and near duplicates.
+
+    Exact duplicates share a content hash. Near duplicates are found by
+    comparing dHashes within `near_threshold` differing bits. Pass
+    `near_threshold=None` to only detect exact duplicates.
+
+    Both hashes are taken when a file is added, so later changes to the file
+    (img_to_pdf rewrites its input) do not affect matching.
+    """
+
+    def __init__(self, near_threshold=DEFAULT_NEAR_THRESHOLD, hash_size=DEFAULT_HASH_SIZE):
+        self.near_threshold = near_threshold
+        self.hash_size = hash_size
+        self.paths = {}
+        self.by_content_hash = {}
+        self.perceptual_paths = []
+        self.perceptual_hashes = np.zeros((0, hash_size * hash_size // 8), dtype=np.uint8)
+        self.outputs = {}
+
+    def add(self, path):
+        """Hash `path` and record it unless it is an exact duplicate.
+
+        Returns `(kind, original)` where kind is None, 'exact' or 'near'.
+        """
+        path = str(pathlib.Path(path).resolve())
+
+        if path in self.paths:
+            return "exact", path
+
+        digest = content_hash(path)
+        if digest in self.by_content_hash:
+            return "exact", self.by_content_hash[digest]
+
+        kind, original = None, None
+        perceptual_hash = None
+
+        if self.near_threshold is not None:
+            perceptual_hash = dhash(path, self.hash_size)
+            if len(self.perceptual_paths) > 0:
+                distances = np.unpackbits(self.perceptual_hashes ^ perceptual_hash, axis=1).sum(axis=1)
+                closest = int(np.argmin(distances))
+                if distances[closest] <= self.near_threshold:
+                    kind, original = "near", self.perceptual_paths[closest]
+
+        self.paths[path] = digest
+        self.by_content_hash[digest] = path
+
+        if perceptual_hash is not None:
+            self.perceptual_paths.append(path)
+            self.perceptual_hashes = np.vstack([self.perceptual_hashes, perceptual_hash])
+
+        return kind, original
+
+    def remove(self, path):
+        """Forget a previously added image."""
+        path = str(pathlib.Path(path).resolve())
+        digest = self.paths.pop(path, None)
+        if digest is None:
+            return
+
+        del self.by_content_hash[digest]
+        self.outputs.pop(path, None)
+
+        if path in self.perceptual_paths:
+            index = self.perceptual_paths.index(path)
+            del self.perceptual_paths[index]
+            self.perceptual_hashes = np.delete(self.perceptual_hashes, index, axis=0)
+
+    def mark_done(self, path, output_path):
+        """Record the output produced for an added image."""
+        self.outputs[str(pathlib.Path(path).resolve())] = output_path
+
+    def output_for(self, path):
+        """Return the output recorded for `path`, or None if it was never finished."""
+        return self.outputs.get(str(pathlib.Path(path).resolve()))
+
+    def clear(self):
+        self.__init__(self.near_threshold, self.hash_size)
+
+    def clear_pending(self):
+        """Forget every image that has no recorded output."""
+        for path in [path for path in self.paths if path not in self.outputs]:
+            self.remove(path)
@@ -3,7 +3,9 @@ import numpy as np
 import reportlab.lib.pagesizes as pagesizes
 import os
 import re 
-from PyPDF2 import PdfMerger
+from img2pdf_log import log, new_job_id
+from dedup import DuplicateIndex, DEFAULT_NEAR_THRESHOLD
+from pdf_merge import merge_pdfs, order_pdfs, parse_page_range
 
 from reportlab.pdfgen import canvas
 from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Image as ReportLabImage
@@ -14,9 +16,13 @@ from reportlab.pdfbase.ttfonts import TTFont
 import pathlib
 import os
 import argparse
+import shutil
+from collections import OrderedDict
+from functools import lru_cache
 import PIL
 
 import sys
+import time
 import locale
 
 print(f"Default encoding: {sys.getdefaultencoding()}")
@@ -35,137 +41,406 @@ except Exception as e:
     print(f"Warning: Font registration failed: {e}. Using default ReportLab font.")
     DEFAULT_FONT = 'Helvetica' 
 
-def process_directory(image_dir, output_dir):
-    """Process all image files in a directory."""
+def process_directory(image_dir, output_dir, overlay="none", preview_size=None, preview_format=None, contact_sheet=False, near_duplicates=DEFAULT_NEAR_THRESHOLD, **filter_options):
+    """Process all image files in a directory.
+
+    `overlay` is 'none', 'image' (separate `_detect` files) or 'pdf' (drawn
+    into each PDF). Exact duplicate images are processed once and their PDF is
+    copied; images within `near_duplicates` dHash bits of an earlier one are
+    reported but still processed. Pass `near_duplicates=None` to skip that check.
+    """
+    contact_sheets = ContactSheetWriter(output_dir) if contact_sheet else None
+    duplicate_index = DuplicateIndex(near_threshold=near_duplicates)
+
     for root, _, files in os.walk(image_dir):
         for file in files:
             if file.lower().endswith(('.png', '.jpg', '.jpeg')):
                 img_path = os.path.join(root, file)
-                img_to_pdf(img_path, output_dir)
-
-def combine_pdfs(pdf_files, output_path):
+                job_id = new_job_id()
+                started = time.perf_counter()
+
+                try:
+                    kind, original = duplicate_index.add(img_path)
+                except Exception as e:
+                    log(f"Could not hash image {img_path}, treating it as unique: {e}", job_id=job_id, file=img_path)
+                    kind, original = None, None
+
+                if kind == "exact" and duplicate_index.output_for(original) is not None:
+                    reuse_pdf(duplicate_index.output_for(original), img_path, output_dir)
+                    log(f"Skipping duplicate image: {img_path} (same as {original})", job_id=job_id, file=img_path)
+                    continue
+                elif kind == "exact":
+                    # the original produced no PDF, so this copy takes its place
+                    log(f"No PDF to reuse for duplicate image {img_path} (same as {original}), processing it instead", job_id=job_id, file=img_path)
+                    duplicate_index.remove(original)
+                    duplicate_index.add(img_path)
+                elif kind == "near":
+                    log(f"Possible duplicate image: {img_path} (similar to {original})", job_id=job_id, file=img_path)
+
+                log(f"Processing file: {img_path}", job_id=job_id, file=img_path)
+                try:
+                    preview = process_file(img_path, output_dir, overlay, preview_size, preview_format, contact_sheet, job_id, **filter_options)
+                except Exception as e:
+                    log(f"Error processing file {img_path}: {e}", error=True, job_id=job_id, file=img_path, duration=time.perf_counter() - started)
+                    continue
+                duplicate_index.mark_done(img_path, pdf_path_for(img_path, output_dir))
+                log("File processed.", job_id=job_id, file=img_path, duration=time.perf_counter() - started)
+                if preview is not None:
+                    contact_sheets.add(preview)
+
+    if contact_sheets is not None:
+        contact_sheets.flush()
+
+def pdf_path_for(img_path, output_dir):
+    """Path of the PDF img_to_pdf writes for `img_path`."""
+    name, ext = os.path.splitext(os.path.basename(img_path))
+    return os.path.join(output_dir, f"{name}.pdf")
+
+def reuse_pdf(original_pdf, img_path, output_dir):
+    """Copy an existing PDF to the name `img_path` would get."""
+    duplicate_pdf = pdf_path_for(img_path, output_dir)
+    if os.path.abspath(original_pdf) != os.path.abspath(duplicate_pdf):
+        shutil.copyfile(original_pdf, duplicate_pdf)
+
+def process_file(img_path, output_dir, overlay="none", preview_size=None, preview_format=None, contact_sheet=False, job_id=None, **filter_options):
+    """Convert one image, returning a contact sheet thumbnail if requested."""
+    preview = None
+    if overlay == "image" or contact_sheet:
+        # overlays only used for the contact sheet can be drawn at thumbnail size
+        size = preview_size if overlay == "image" else CONTACT_SHEET_THUMB_SIZE
+        preview = draw_bounds_before_process(img_path, output_dir, size, preview_format, save=overlay == "image", job_id=job_id, **filter_options)
+        preview.thumbnail((CONTACT_SHEET_THUMB_SIZE, CONTACT_SHEET_THUMB_SIZE))
+    img_to_pdf(img_path, output_dir, overlay=overlay == "pdf", job_id=job_id, **filter_options)
+    return preview if contact_sheet else None
+
+def combine_pdfs(pdf_files, output_path, order="none", pages=None):
     """Combine multiple PDF files into a single PDF."""
-    merger = PdfMerger()
-    for pdf in pdf_files:
-        merger.append(pdf)
-    merger.write(output_path)
-    merger.close()
+    page_ranges = parse_page_range(pages)
+    entries = [(str(pdf), page_ranges) for pdf in order_pdfs(pdf_files, order)]
+    return merge_pdfs(entries, output_path)
+
+CONTACT_SHEET_THUMB_SIZE = 256
+CONTACT_SHEET_COLUMNS = 6
+CONTACT_SHEET_MAX_IMAGES = 60
+
+DEFAULT_MIN_CONFIDENCE = 0.2
+DEFAULT_NMS_IOU = 0.7
+DEFAULT_MIN_BOX_SIZE = 4
 
-def draw_bounds_before_process(img_path, output_dir):
+_ocr_cache = OrderedDict()
+_OCR_CACHE_SIZE = 16
+
+def get_reader():
     global _reader
     if _reader is None:
         from easyocr import Reader
         _reader = Reader(['sv', 'en'], model_storage_directory=pathlib.Path('./model').resolve())
+    return _reader
 
+def load_image(img_path):
+    """Open an image and apply its EXIF orientation."""
     try:
-        image = Image.open(img_path, exif=None).convert('RGB')
+        image = Image.open(img_path, exif=None)
     except TypeError:
-        
-        image = Image.open(img_path).convert('RGB')
+        image = Image.open(img_path)
         try:
             import PIL.ImageOps
-            image = PIL.ImageOps.exif_transpose(image) 
+            image = PIL.ImageOps.exif_transpose(image)
         except AttributeError:
             print("Warning: PIL.ImageOps.exif_transpose not available. Image rotation might not be corrected.")
+    return image
+
+def results_to_arrays(results):
+    """Convert EasyOCR `(bbox, text, prob)` results into NumPy arrays.
+
+    Returns `(boxes, texts, probs)` where `boxes` has shape (N, 4, 2).
+    """
+    if len(results) == 0:
+        return np.zeros((0, 4, 2), dtype=np.float64), np.array([], dtype=object), np.zeros(0, dtype=np.float64)
+
+    boxes = np.array([bbox for (bbox, text, prob) in results], dtype=np.float64).reshape(-1, 4, 2)
+    texts = np.empty(len(results), dtype=object)
+    texts[:] = [text for (bbox, text, prob) in results]
+    probs = np.array([prob for (bbox, text, prob) in results], dtype=np.float64)
+    return boxes, texts, probs
+
+def box_bounds(boxes):
+    """Return `(x_min, x_max, y_min, y_max)` arrays for (N, 4, 2) boxes."""
+    x_min, y_min = boxes.min(axis=1).T
+    x_max, y_max = boxes.max(axis=1).T
+    return x_min, x_max, y_min, y_max
+
+def non_max_suppression(boxes, probs, iou_threshold):
+    """Return indices of boxes kept after greedy non-maximum suppression."""
+    x_min, x_max, y_min, y_max = box_bounds(boxes)
+    areas = (x_max - x_min) * (y_max - y_min)
+    order = np.argsort(-probs, kind="stable")
+    keep = []
+
+    while order.size > 0:
+        i = order[0]
+        keep.append(i)
+        rest = order[1:]
+
+        overlap_w = np.clip(np.minimum(x_max[i], x_max[rest]) - np.maximum(x_min[i], x_min[rest]), 0, None)
+        overlap_h = np.clip(np.minimum(y_max[i], y_max[rest]) - np.maximum(y_min[i], y_min[rest]), 0, None)
+        intersection = overlap_w * overlap_h
+        union = areas[i] + areas[rest] - intersection
+        iou = np.divide(intersection, union, out=np.zeros_like(intersection), where=union > 0)
+
+        order = rest[iou <= iou_threshold]
+
+    return np.sort(np.array(keep, dtype=np.intp))
+
+def filter_results(boxes, texts, probs, min_confidence=DEFAULT_MIN_CONFIDENCE, nms_iou=DEFAULT_NMS_IOU, min_box_size=DEFAULT_MIN_BOX_SIZE):
+    """Drop low-confidence, tiny and duplicate boxes, then sort in reading order.
+
+    Pass `None` for any threshold to disable that filter.
+    """
+    mask = np.char.str_len(texts.astype(str)) > 0 if len(texts) else np.zeros(0, dtype=bool)
+
+    if min_confidence is not None:
+        mask &= probs >= min_confidence
+
+    if min_box_size is not None:
+        x_min, x_max, y_min, y_max = box_bounds(boxes)
+        mask &= ((x_max - x_min) >= min_box_size) & ((y_max - y_min) >= min_box_size)
+
+    boxes, texts, probs = boxes[mask], texts[mask], probs[mask]
+
+    if nms_iou is not None and len(boxes) > 1:
+        keep = non_max_suppression(boxes, probs, nms_iou)
+        boxes, texts, probs = boxes[keep], texts[keep], probs[keep]
+
+    # reading order: top-left corner, top to bottom, then left to right
+    order = np.lexsort((boxes[:, 0, 0], boxes[:, 0, 1]))
+    return boxes[order], texts[order], probs[order]
+
+def ocr_image(img_path, image_np=None, min_confidence=DEFAULT_MIN_CONFIDENCE, nms_iou=DEFAULT_NMS_IOU, min_box_size=DEFAULT_MIN_BOX_SIZE):
+    """Run OCR on an image and return filtered `(boxes, texts, probs)` arrays.
+
+    Raw results are cached per file (path, size and mtime), so the detection
+    overlay and the PDF layer only run the reader once per image.
+    """
+    stat = os.stat(img_path)
+    key = (str(pathlib.Path(img_path).resolve()), stat.st_size, stat.st_mtime_ns)
+
+    if key in _ocr_cache:
+        _ocr_cache.move_to_end(key)
+        arrays = _ocr_cache[key]
+    else:
+        if image_np is None:
+            image_np = np.array(load_image(img_path).convert('RGB'))
+        arrays = results_to_arrays(get_reader().readtext(image_np))
+        _ocr_cache[key] = arrays
+        if len(_ocr_cache) > _OCR_CACHE_SIZE:
+            _ocr_cache.popitem(last=False)
 
-    image_np = np.array(image)
+    return filter_results(*arrays, min_confidence=min_confidence, nms_iou=nms_iou, min_box_size=min_box_size)
+
+OVERLAY_FONT_SIZE = 16
+PREVIEW_FORMATS = {"webp": ("WEBP", ".webp"), "jpeg": ("JPEG", ".jpg")}
+
+@lru_cache(maxsize=None)
+def get_overlay_font(size=OVERLAY_FONT_SIZE):
+    """Load the overlay label font once per size."""
+    try:
+        return ImageFont.truetype("arial.ttf", size=size)
+    except IOError:
+        return ImageFont.load_default()
+
+def render_overlay(image, boxes, texts, max_size=None):
+    """Draw OCR boxes and labels onto a copy of `image` in a single pass.
+
+    If `max_size` is given, the image is downscaled first so drawing happens at
+    preview resolution.
+    """
+    image = image.convert('RGB')
+    scale = 1.0
+
+    if max_size and max(image.size) > max_size:
+        scale = max_size / max(image.size)
+        image = image.resize((max(1, round(image.width * scale)), max(1, round(image.height * scale))), Image.BILINEAR)
 
-    results = _reader.readtext(image_np)
-    
     draw = ImageDraw.Draw(image)
+    font = get_overlay_font(max(8, round(OVERLAY_FONT_SIZE * scale)))
+    line_width = max(1, round(2 * scale))
 
-    for (bbox, text, prob) in results:
-        top_left = tuple(map(int, bbox[0]))
-        top_right = tuple(map(int, bbox[1]))
-        bottom_right = tuple(map(int, bbox[2]))
-        bottom_left = tuple(map(int, bbox[3]))
-        draw.line([top_left, top_right, bottom_right, bottom_left, top_left], width=2, fill='red')
+    points = np.rint(boxes * scale).astype(int)
+    # closed polygons: corner 0 -> 1 -> 2 -> 3 -> 0
+    outlines = np.concatenate([points, points[:, :1]], axis=1)
 
-        try:
-            font = ImageFont.truetype("arial.ttf", size=16) 
-        except IOError:
-            font = ImageFont.load_default()
+    for outline, text in zip(outlines.tolist(), texts):
+        draw.line([tuple(point) for point in outline], width=line_width, fill='red')
+        draw.text(tuple(outline[0]), text, fill='blue', font=font)
 
-        draw.text(top_left, text, fill='blue', font=font)
+    return image
 
-    img_filename = os.path.basename(img_path)
-    name, ext = os.path.splitext(img_filename)
-    output_path = os.path.join(output_dir, f"{name}_detect{ext}")
-    image.save(output_path)
-    
-    print(f"Detection visualized image saved to: {output_path}")
+def save_overlay(image, img_path, output_dir, preview_format=None, job_id=None):
+    """Save an overlay image next to the PDFs as `<name>_detect`.
 
-def img_to_pdf(img_path, output_dir):
-    global _reader
+    `preview_format` is 'webp' or 'jpeg' for compressed previews; None keeps the
+    input's own format.
+    """
+    name, ext = os.path.splitext(os.path.basename(img_path))
 
-    if _reader is None:
-        from easyocr import Reader
-        _reader = Reader(['sv', 'en'], model_storage_directory=pathlib.Path('./model').resolve())
+    if preview_format is None:
+        output_path = os.path.join(output_dir, f"{name}_detect{ext}")
+        image.save(output_path)
+        return output_path
 
+    pil_format, preview_ext = PREVIEW_FORMATS[preview_format]
+    output_path = os.path.join(output_dir, f"{name}_detect{preview_ext}")
     try:
-        image_pil = Image.open(img_path, exif=None)
-    except TypeError:
-        image_pil = Image.open(img_path)
-        try:
-            import PIL.ImageOps
-            image_pil = PIL.ImageOps.exif_transpose(image_pil)
-        except AttributeError:
-            print("Warning: PIL.ImageOps.exif_transpose not available.")
-
-    image_pil.save(img_path)
-    print(f"DEBUG: Overwrote original image file with EXIF-corrected version: {img_path}")
-    
+        image.save(output_path, format=pil_format, quality=80)
+    except (KeyError, OSError):
+        # Pillow built without WebP support
+        log(f"Warning: {pil_format} previews not supported, saving as JPEG instead.", job_id=job_id, file=img_path)
+        output_path = os.path.join(output_dir, f"{name}_detect.jpg")
+        image.save(output_path, format="JPEG", quality=80)
+    return output_path
+
+def write_contact_sheet(images, output_path, thumb_size=CONTACT_SHEET_THUMB_SIZE, columns=CONTACT_SHEET_COLUMNS):
+    """Tile overlay previews into a single contact sheet image."""
+    if not images:
+        return None
+
+    columns = max(1, min(columns, len(images)))
+    rows = -(-len(images) // columns)
+    sheet = Image.new('RGB', (columns * thumb_size, rows * thumb_size), 'white')
+
+    for i, image in enumerate(images):
+        thumb = image.copy()
+        thumb.thumbnail((thumb_size, thumb_size))
+        x = (i % columns) * thumb_size + (thumb_size - thumb.width) // 2
+        y = (i // columns) * thumb_size + (thumb_size - thumb.height) // 2
+        sheet.paste(thumb, (x, y))
+
+    sheet.save(output_path, quality=80)
+    log(f"Detection contact sheet saved to: {output_path}")
+    return output_path
+
+class ContactSheetWriter:
+    """Collects overlay thumbnails and writes numbered contact sheets as they fill.
+
+    Each sheet holds at most `per_sheet` thumbnails, which keeps it well below
+    JPEG's 65,500 px size limit and bounds the thumbnails held in memory.
+    """
+
+    def __init__(self, output_dir, name="contact_sheet", thumb_size=CONTACT_SHEET_THUMB_SIZE, columns=CONTACT_SHEET_COLUMNS, per_sheet=CONTACT_SHEET_MAX_IMAGES):
+        self.output_dir = output_dir
+        self.name = name
+        self.thumb_size = thumb_size
+        self.columns = columns
+        self.per_sheet = max(1, per_sheet)
+        self.images = []
+        self.sheet_count = 0
+
+    def add(self, image):
+        thumb = image.copy()
+        thumb.thumbnail((self.thumb_size, self.thumb_size))
+        self.images.append(thumb)
+        if len(self.images) >= self.per_sheet:
+            self.flush()
+
+    def flush(self):
+        """Write the pending thumbnails to the next sheet, if there are any."""
+        if not self.images:
+            return None
+        images, self.images = self.images, []
+        self.sheet_count += 1
+        output_path = os.path.join(self.output_dir, f"{self.name}_{self.sheet_count:03d}.jpg")
+        return write_contact_sheet(images, output_path, self.thumb_size, self.columns)
+
+def draw_bounds_before_process(img_path, output_dir, preview_size=None, preview_format=None, save=True, job_id=None, **filter_options):
+    """Render the OCR detection overlay for an image and return it.
+
+    With `save=False` the overlay is only returned, e.g. for a contact sheet.
+    """
+    image = load_image(img_path).convert('RGB')
+
+    boxes, texts, probs = ocr_image(img_path, np.array(image), **filter_options)
+
+    overlay = render_overlay(image, boxes, texts, max_size=preview_size)
+
+    if save:
+        output_path = save_overlay(overlay, img_path, output_dir, preview_format, job_id)
+        log(f"Detection visualized image saved to: {output_path}", job_id=job_id, file=img_path)
+
+    return overlay
+
+def draw_pdf_overlay(c, boxes, texts, img_height):
+    """Draw OCR boxes and labels as vector graphics on a ReportLab canvas."""
+    c.saveState()
+    c.setStrokeColorRGB(1, 0, 0)
+    c.setFillColorRGB(0, 0, 1)
+    c.setLineWidth(2)
+    c.setFont(DEFAULT_FONT, OVERLAY_FONT_SIZE)
+
+    flipped = boxes.copy()
+    flipped[:, :, 1] = img_height - flipped[:, :, 1]
+
+    for bbox, text in zip(flipped.tolist(), texts):
+        path = c.beginPath()
+        path.moveTo(*bbox[0])
+        for point in bbox[1:]:
+            path.lineTo(*point)
+        path.close()
+        c.drawPath(path, stroke=1, fill=0)
+        # PIL anchors labels at the top-left corner, ReportLab at the baseline
+        c.drawString(bbox[0][0], bbox[0][1] - OVERLAY_FONT_SIZE, text)
+
+    c.restoreState()
+
+def img_to_pdf(img_path, output_dir, overlay=False, job_id=None, **filter_options):
+    image_pil = load_image(img_path)
     image_np = np.array(image_pil)
     img_width, img_height = image_pil.size
 
-    results = _reader.readtext(image_np)
+    # look up OCR before overwriting the file, so results cached by the overlay are reused
+    boxes, texts, probs = ocr_image(img_path, image_np, **filter_options)
+
+    image_pil.save(img_path)
+    log(f"DEBUG: Overwrote original image file with EXIF-corrected version: {img_path}", job_id=job_id, file=img_path)
 
     with open(file=os.path.join(output_dir, 'text.txt'), mode='w', encoding="utf-8") as f:
-        for (bbox, text, prob) in results:
+        for text in texts:
             f.write(text.encode("utf-8").decode('utf-8') + '\n')
     
     # Pass the text results to the name extraction function
-    texts = [text for (bbox, text, prob) in results]
-    names = extract_key_details(texts)
+    names = extract_key_details(list(texts))
     
-    print(f"Names detected: {names}")
+    log(f"Names detected: {names}", job_id=job_id, file=img_path)
 
     with open(file=os.path.join(output_dir, 'names.txt'), mode='w', encoding="utf-8") as f:
         for name in names:
             f.write(name.encode("utf-8").decode('utf-8') + '\n')
-    
-    results.sort(key=lambda res: (res[0][0][1], res[0][0][0]))
 
-    pdf_filename = os.path.basename(img_path)
-    name, ext = os.path.splitext(pdf_filename)
-    output_pdf_path = os.path.join(output_dir, f"{name}.pdf")
+    output_pdf_path = pdf_path_for(img_path, output_dir)
 
     c = canvas.Canvas(output_pdf_path, pagesize=(img_width, img_height)) 
 
     c.drawImage(img_path, 0, 0, width=img_width, height=img_height)
 
+    if overlay:
+        draw_pdf_overlay(c, boxes, texts, img_height)
+
+    x_min, x_max, y_min, y_max = box_bounds(boxes)
+    reportlab_y = img_height - y_max
+    font_sizes = np.maximum(8, ((y_max - y_min) * 0.8).astype(int))
+
     linked_text_objects = []
     last_text_label_name = None
 
-    for i, (bbox, text, prob) in enumerate(results):
-        
-        x_min = min([coord[0] for coord in bbox])
-        x_max = max([coord[0] for coord in bbox])
-        y_min = min([coord[1] for coord in bbox])
-        y_max = max([coord[1] for coord in bbox])
+    c.setFillAlpha(0)
 
+    for i, text in enumerate(texts):
         text_label_name = f"textlabel_{i}"
 
-        
-        reportlab_y = img_height - y_max 
-        text_height = y_max - y_min 
-
-        c.setFillAlpha(0)
-        font_size = max(8, int(text_height * 0.8)) 
-        c.setFont(DEFAULT_FONT, font_size) 
+        c.setFont(DEFAULT_FONT, int(font_sizes[i])) 
 
         textobject = c.beginText()
-        textobject.setTextOrigin(x_min, reportlab_y) 
+        textobject.setTextOrigin(float(x_min[i]), float(reportlab_y[i])) 
         textobject.textLine(text) 
 
         c.drawText(textobject)
@@ -178,7 +453,7 @@ def img_to_pdf(img_path, output_dir):
         last_text_label_name = text_label_name
     
     c.save()
-    print(f"PDF with transparent text labels saved to: {output_pdf_path}")
+    log(f"PDF with transparent text labels saved to: {output_pdf_path}", job_id=job_id, file=img_path)
 
 def includes_acronym(string):
     return re.search(r'\b[A-ZÅÄÖ]{2,}(\.[A-ZÅÄÖ]{2,})*\b', string) is not None
@@ -208,7 +483,7 @@ def extract_key_details(results: list[str]) -> list[str]:
 
     names = []
 
-    for (bbox, text, prob) in results:
+    for text in results:
         result = None
 
         for strategy in strategies:
@@ -228,6 +503,16 @@ if __name__ == "__main__":
     test_group = parser.add_mutually_exclusive_group()
     test_group.add_argument("--test-name-detect", type=str, help="Only the name extraction on the input text file.")
 
+    parser.add_argument("--min_confidence", type=float, help="Discard OCR boxes below this confidence.", default=DEFAULT_MIN_CONFIDENCE)
+    parser.add_argument("--nms_iou", type=float, help="Overlap above which duplicate OCR boxes are suppressed.", default=DEFAULT_NMS_IOU)
+    parser.add_argument("--min_box_size", type=float, help="Discard OCR boxes narrower or shorter than this many pixels.", default=DEFAULT_MIN_BOX_SIZE)
+
+    parser.add_argument("--overlay", choices=("none", "image", "pdf"), help="Draw OCR detections into a separate image or into the PDF.", default="none")
+    parser.add_argument("--preview_size", type=int, help="Downscale detection images so their longest side is at most this many pixels.", default=None)
+    parser.add_argument("--preview_format", choices=tuple(PREVIEW_FORMATS), help="Save detection images as compressed previews.", default=None)
+    parser.add_argument("--near_duplicates", type=int, help="Report images whose perceptual hashes differ by at most this many bits; negative disables the check.", default=DEFAULT_NEAR_THRESHOLD)
+    parser.add_argument("--contact_sheet", action="store_true", help="Write a contact sheet of all detections when processing a directory.")
+
     input_group = parser.add_mutually_exclusive_group(required=True)
     input_group.add_argument("--image_path", type=str, help="Path to the input image file.", default=None)
     input_group.add_argument("--image_dir", type=str, help="Directory containing input image files.", default=None)
@@ -241,7 +526,15 @@ if __name__ == "__main__":
             names = extract_key_details(texts)
             print(f"Names detected: {names}")
     else:
+        filter_options = {
+            "min_confidence": args.min_confidence,
+            "nms_iou": args.nms_iou,
+            "min_box_size": args.min_box_size,
+        }
         if args.image_path:
-            img_to_pdf(args.image_path, args.output_dir)
+            if args.overlay == "image":
+                draw_bounds_before_process(args.image_path, args.output_dir, args.preview_size, args.preview_format, **filter_options)
+            img_to_pdf(args.image_path, args.output_dir, overlay=args.overlay == "pdf", **filter_options)
         elif args.image_dir:
-            process_directory(args.image_dir, args.output_dir)
\ No newline at end of file
+            near_duplicates = args.near_duplicates if args.near_duplicates >= 0 else None
+            process_directory(args.image_dir, args.output_dir, args.overlay, args.preview_size, args.preview_format, args.contact_sheet, near_duplicates, **filter_options)
\ No newline at end of file
@@ -2,8 +2,9 @@ import tkinter as tk
 from tkinter import ttk, filedialog, messagebox, Text
 import pathlib
 import time
-import traceback
-from img2pdf import img_to_pdf, draw_bounds_before_process
+from img2pdf_log import log, new_job_id, recent_messages, setup_logging, DEFAULT_RING_SIZE
+from dedup import DuplicateIndex
+from img2pdf import img_to_pdf, draw_bounds_before_process, pdf_path_for, ContactSheetWriter
 import threading
 import queue
 import json
@@ -54,10 +55,33 @@ class Img2PdfGUI:
         self.progress_label.pack()
         self.hide_progress()
 
+        # Live log view fed from the logging ring buffer
+        self.log_view = Text(root, height=8, state=tk.DISABLED, wrap="none")
+        self.log_view.pack(fill="x", padx=10, pady=(0, 10))
+        self.log_sequence = 0
+        self.root.after(500, self.refresh_log_view)
+
         self.processing_queue = queue.Queue()
         self.files_processed = 0
         self.processing_thread = None
 
+        # Detection overlay: "image" writes downscaled previews, "pdf" draws into the PDF, "none" skips it
+        self.overlay_mode = "image"
+        self.preview_size = 1024
+        self.preview_format = "webp"
+        self.contact_sheets = None
+
+        # Catches the same scans being added more than once. Hashing runs on its
+        # own thread; rows are inserted on the Tk thread as results come back.
+        self.duplicate_index = DuplicateIndex()
+        self.dedup_generation = 0 # Bumped by clear so results for cleared adds are dropped
+        self.dedup_pending = 0 # Adds still waiting for a result; processing waits for these
+        self.dedup_requests = queue.Queue()
+        self.dedup_results = queue.Queue()
+        self.dedup_thread = threading.Thread(target=self.run_dedup, daemon=True)
+        self.dedup_thread.start()
+        self.root.after(100, self.poll_dedup_results)
+
         # Load icons
         self.file_icon = ImageTk.PhotoImage(Image.open("icons/file_icon.png").resize((16, 16)))
         self.folder_icon = ImageTk.PhotoImage(Image.open("icons/folder_icon.png").resize((16, 16)))
@@ -97,7 +121,74 @@ class Img2PdfGUI:
         self.input_list.set(item_id, "Item ID", item_id)
 
     def add_file_to_list(self, file_path, is_directory=True):
-        """Add a single file to the input list."""
+        """Queue a single file for duplicate checking; it is listed once hashed."""
+        self.dedup_pending += 1
+        self.update_dedup_pending()
+        self.dedup_requests.put(("add", file_path, self.dedup_generation))
+
+    def run_dedup(self):
+        """Applies duplicate index requests in order on the dedup thread.
+
+        Requests are (action, file_path, argument) tuples; the argument is the
+        generation for "add" and "clear" and the output PDF for "done".
+        """
+        cleared_generation = 0
+        while True:
+            action, file_path, argument = self.dedup_requests.get()
+            if action == "add":
+                generation = argument
+                if generation < cleared_generation: # Cleared before it was hashed
+                    self.dedup_results.put((generation, file_path, None, None, None))
+                    continue
+                try:
+                    duplicate_kind, original = self.duplicate_index.add(file_path)
+                except Exception as e:
+                    log(f"Could not hash image {file_path}, treating it as unique: {e}")
+                    duplicate_kind, original = None, None
+                output = self.duplicate_index.output_for(original) if duplicate_kind == "exact" else None
+                self.dedup_results.put((generation, file_path, duplicate_kind, original, output))
+            elif action == "remove":
+                self.duplicate_index.remove(file_path)
+            elif action == "done":
+                self.duplicate_index.mark_done(file_path, argument)
+            elif action == "clear":
+                cleared_generation = argument
+                self.duplicate_index.clear_pending() # Processed files stay known
+
+    def poll_dedup_results(self):
+        """Inserts rows for files the dedup thread has finished hashing."""
+        try:
+            while True:
+                generation, *result = self.dedup_results.get_nowait()
+                self.dedup_pending -= 1
+                if generation == self.dedup_generation: # Older results were cleared
+                    self.insert_input_row(*result)
+        except queue.Empty:
+            pass
+        self.update_dedup_pending()
+        self.root.after(100, self.poll_dedup_results)
+
+    def update_dedup_pending(self):
+        """Shows how many files are still being checked and holds back processing until they are listed."""
+        if self.dedup_pending > 0:
+            self.dedup_pending_var.set(self.get_translation("table_input_files.lbl_checking_duplicates").format(count=self.dedup_pending))
+            self.arrow_button.config(state=tk.DISABLED)
+        else:
+            self.dedup_pending_var.set("")
+            if not self.processing_thread or not self.processing_thread.is_alive():
+                self.arrow_button.config(state=tk.NORMAL)
+
+    def insert_input_row(self, file_path, duplicate_kind, original, output):
+        """Add a single hashed file to the input list."""
+        if duplicate_kind == "exact" and output is not None:
+            log(f"Skipping already processed image: {file_path} (same as {original}, output: {output})")
+            return
+        elif duplicate_kind == "exact":
+            log(f"Skipping duplicate image: {file_path} (same as {original})")
+            return
+        elif duplicate_kind == "near":
+            log(f"Possible duplicate image: {file_path} (similar to {original})")
+
         file_path_obj = pathlib.Path(file_path)
         file_size = file_path_obj.stat().st_size
         item_id = self.input_list.insert(
@@ -108,7 +199,8 @@ class Img2PdfGUI:
             self.input_list, text="X", width=3,
             command=lambda item=item_id: self.delete_input_item(item))
         self.input_list.set(item_id, "Delete", "")
-        self.input_list.item(item_id, tags=("delete_button",))
+        tags = ("delete_button", "near_duplicate") if duplicate_kind == "near" else ("delete_button",)
+        self.input_list.item(item_id, tags=tags)
         self.input_list.tag_bind(
             "delete_button", "<Button-1>",
             lambda e, item=item_id: self.on_delete_button_click(e, item))
@@ -178,6 +270,7 @@ class Img2PdfGUI:
         self.output_list.heading("Size", text=self.get_translation("table_output_files.col_file_size"))
         self.output_button.config(text=self.get_translation("table_output_files.btn_choose_dir"))
         self.arrow_button.config(text=self.get_translation("btn_process"))
+        self.update_dedup_pending()
 
     def create_process_tab(self):
         self.input_frame = ttk.LabelFrame(self.process_frame, text=self.get_translation("table_input_files.lbl_title"))
@@ -204,6 +297,7 @@ class Img2PdfGUI:
         self.input_list.column("Delete", width=30, anchor="center")
         self.input_list.pack(expand=True, fill="both", padx=5, pady=5)
         self.input_list.tag_configure("hidden_id", foreground="#d9d9d9")
+        self.input_list.tag_configure("near_duplicate", background="#fff3cd")
 
         # Buttons frame for input actions
         buttons_frame = ttk.Frame(self.input_frame)
@@ -236,6 +330,11 @@ class Img2PdfGUI:
         self.clear_button.pack(side=tk.LEFT, padx=5)
         self.clear_button.id_str = "table_input_files.btn_clear"
 
+        # Number of added files still being checked for duplicates
+        self.dedup_pending_var = tk.StringVar(value="")
+        dedup_pending_label = ttk.Label(buttons_frame, textvariable=self.dedup_pending_var)
+        dedup_pending_label.pack(side=tk.LEFT, padx=5)
+
         # Right-click context menu for input list
         self.input_list.bind("<Button-3>", self.show_input_context_menu)
 
@@ -319,6 +418,7 @@ class Img2PdfGUI:
         """Deletes the selected items from the input list."""
         selected_items = self.input_list.selection()
         for item in selected_items:
+            self.forget_input_item(item)
             self.input_list.delete(item)
         if not self.input_list.get_children():
             self.hide_progress()
@@ -329,20 +429,7 @@ class Img2PdfGUI:
         )
         if file_paths:
             for path in file_paths:
-                file_path = pathlib.Path(path)
-                file_size = file_path.stat().st_size
-                item_id = self.input_list.insert("", "end", values=(file_path, file_path.name, file_size, "", "")) # Added empty string for Item ID initially
-                self.input_list.set(item_id, "Item ID", item_id) # Set the actual item ID in the hidden column
-                # Create the delete button *after* inserting the item, and use a lambda
-                delete_button = ttk.Button(self.input_list, text="X", width=3,
-                                            command=lambda item=item_id: self.delete_input_item(item))
-                # Place the button in the "Delete" column of the Treeview
-                self.input_list.set(item_id, "Delete", "")
-                self.input_list.item(item_id, tags=("delete_button",))
-                # Bind to the delete button's tag
-                self.input_list.tag_bind("delete_button", "<Button-1>",
-                                          lambda e, item=item_id: self.on_delete_button_click(e, item))
-            self.show_progress()
+                self.add_file_to_list(path)
 
     def on_delete_button_click(self, event, item_id):
         """Handles a click on the delete button within the Treeview."""
@@ -352,13 +439,21 @@ class Img2PdfGUI:
 
     def delete_input_item(self, item_id):
         """Deletes a single item from the input list."""
+        self.forget_input_item(item_id)
         self.input_list.delete(item_id)
         if not self.input_list.get_children():
             self.hide_progress()
 
+    def forget_input_item(self, item_id):
+        """Removes an input item's image from the duplicate index."""
+        file_path = self.input_list.item(item_id)["values"][1] # Path is in the 2nd column
+        self.dedup_requests.put(("remove", file_path, None))
+
     def clear_input_list(self):
         for item in self.input_list.get_children():
             self.input_list.delete(item)
+        self.dedup_generation += 1
+        self.dedup_requests.put(("clear", None, self.dedup_generation))
         self.hide_progress()
 
     def choose_output_directory(self):
@@ -378,12 +473,30 @@ class Img2PdfGUI:
         self.progress_bar_var.set(value)
         self.root.update_idletasks()
 
+    def refresh_log_view(self):
+        """Appends messages logged since the last refresh to the log view."""
+        self.log_sequence, messages = recent_messages(self.log_sequence)
+        if messages:
+            self.log_view.config(state=tk.NORMAL)
+            self.log_view.insert(tk.END, "\n".join(messages) + "\n")
+            # keep the widget about as long as the ring buffer
+            line_count = int(self.log_view.index("end-1c").split(".")[0])
+            if line_count > DEFAULT_RING_SIZE:
+                self.log_view.delete("1.0", f"{line_count - DEFAULT_RING_SIZE}.0")
+            self.log_view.see(tk.END)
+            self.log_view.config(state=tk.DISABLED)
+        self.root.after(500, self.refresh_log_view)
+
     def start_processing(self):
         output_dir = pathlib.Path(self.output_path_var.get())
         if not output_dir.exists():
             output_dir.mkdir(parents=True, exist_ok=True)
             log(f"Created output directory: {output_dir}")
 
+        if self.dedup_pending > 0:
+            messagebox.showwarning("Checking Files", "Please wait until all added files have been checked for duplicates.")
+            return
+
         total_files = len(self.input_list.get_children())
         if total_files == 0:
             messagebox.showwarning("No Files", "Please select files to process.")
@@ -401,7 +514,7 @@ class Img2PdfGUI:
 
         # Add all files to the processing queue
         for item_id in self.input_list.get_children():
-            file_path = self.input_list.item(item_id)["values"][0]
+            file_path = self.input_list.item(item_id)["values"][1] # Path is in the 2nd column
             self.processing_queue.put((file_path, output_dir, item_id))
 
         # Start the processing thread if it's not already running
@@ -410,75 +523,66 @@ class Img2PdfGUI:
             self.processing_thread.daemon = True
             self.processing_thread.start()
 
+    def add_to_contact_sheet(self, preview, output_dir):
+        """Adds a detection preview to this batch's contact sheets, logging write errors."""
+        if self.contact_sheets is None:
+            self.contact_sheets = ContactSheetWriter(output_dir, f"contact_sheet_{time.strftime('%Y-%m-%d_%H-%M-%S')}")
+        try:
+            self.contact_sheets.add(preview)
+        except Exception as e:
+            log(f"Error writing contact sheet: {e}", error=True)
+
     def process_queue(self):
         """Processes the queue of images one by one."""
         while not self.processing_queue.empty():
             file_path, output_dir, item_id = self.processing_queue.get()
-            log(f"Processing file: {file_path}")
+            job_id = new_job_id()
+            started = time.perf_counter()
+            log(f"Processing file: {file_path}", job_id=job_id, file=file_path)
 
             try:
-                draw_bounds_before_process(file_path, output_dir)
-                img_to_pdf(file_path, output_dir)
+                preview = None
+                if self.overlay_mode == "image":
+                    preview = draw_bounds_before_process(file_path, output_dir, self.preview_size, self.preview_format, job_id=job_id)
+                img_to_pdf(file_path, output_dir, overlay=self.overlay_mode == "pdf", job_id=job_id)
+                if preview is not None:
+                    self.add_to_contact_sheet(preview, output_dir)
                 self.files_processed += 1
                 progress_percent = (self.files_processed / self.progress_bar["maximum"]) * 100
                 self.update_progress(progress_percent)
-                log(f"File processed. Progress: {progress_percent:.2f}%")
+                log(f"File processed. Progress: {progress_percent:.2f}%", job_id=job_id, file=file_path, duration=time.perf_counter() - started)
 
                 # Move item from input to output list
                 item_values = self.input_list.item(item_id)["values"]
-                file_name = item_values[1] # File name is in the 2nd column
-                file_size = item_values[2] # File size is in the 3rd column
+                file_name = item_values[2] # File name is in the 3rd column
+                file_size = item_values[3] # File size is in the 4th column
                 self.output_list.insert("", "end", values=(file_name, file_size)) # Insert into output list
+                self.dedup_requests.put(("done", file_path, pdf_path_for(file_path, output_dir))) # Re-adds are reported, not reprocessed
                 self.input_list.delete(item_id) # Delete from input list
 
             except Exception as e:
-                log(f"Error processing file {file_path}: {e}", error=True)
+                log(f"Error processing file {file_path}: {e}", error=True, job_id=job_id, file=file_path, duration=time.perf_counter() - started)
 
             self.processing_queue.task_done()
 
+        if self.contact_sheets is not None:
+            try:
+                self.contact_sheets.flush()
+            except Exception as e:
+                log(f"Error writing contact sheet: {e}", error=True)
+            self.contact_sheets = None
+
         if self.files_processed >= self.progress_bar["maximum"]:
             log("PDF conversion finished.")
             translated_title = self.get_translation("popup_finished.title") # Get translated title
             translated_message = self.get_translation("popup_finished.message") # Get translated message
             messagebox.showinfo(translated_title, translated_message)
-            self.arrow_button.config(state=tk.NORMAL) # Re-enable process button
+            if self.dedup_pending == 0:
+                self.arrow_button.config(state=tk.NORMAL) # Re-enable process button
             self.root.config(cursor="") # Revert cursor to default
             if not self.input_list.get_children(): # Hide progress bar if input list is now empty
                 self.hide_progress()
 
-session_date = time.strftime("%Y-%m-%d_%H-%M-%S")
-
-def log(message, error=False):
-    log_file = assert_log_file()
-    t = time.strftime("%Y-%m-%d %H:%M:%S")
-
-    if not (error):
-        print(f"[ {t} ] {message}")
-        with log_file.open("a") as f:
-            f.write(f"[ {t} ] {message}\n")
-    else:
-        print(f"[ {t} ] {message}")
-        with log_file.open("a") as f:
-             f.write(f"[ {t} ] {message}\n")
-        traceback.print_exc()
-        with log_file.open("a") as f:
-            traceback.print_exc(file=f)
-
-def assert_log_file():
-    global session_date
-
-    log_dir = pathlib.Path("./logs")
-
-    if not log_dir.exists():
-        log_dir.mkdir()
-
-    log_file = pathlib.Path(log_dir, f"log_{session_date}.txt")
-
-    if not log_file.exists():
-        log_file.touch()
-
-    return log_file
-
 def assert_directories():
     input_dir = pathlib.Path("./input")
     output_dir = pathlib.Path("./output")
@@ -501,7 +605,7 @@ def assert_directories():
 
 def main():
     input_dir, output_dir, model_dir, data_dir = assert_directories()
-    log_file = assert_log_file()
+    setup_logging()
 
     root = tk.Tk()
     gui = Img2PdfGUI(root)
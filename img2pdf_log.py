@@ -0,0 +1,173 @@
+from collections import deque
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+
+import atexit
+import copy
+import json
+import logging
+import pathlib
+import queue
+import sys
+import threading
+import time
+import uuid
+
+DEFAULT_MAX_BYTES = 5 * 1024 * 1024
+DEFAULT_BACKUP_COUNT = 5
+DEFAULT_ROTATE_INTERVAL = 24 * 60 * 60
+DEFAULT_RING_SIZE = 1000
+
+session_date = time.strftime("%Y-%m-%d_%H-%M-%S")
+
+logger = logging.getLogger("img2pdf")
+
+_listener = None
+_queue_handler = None
+_ring_buffer = None
+_setup_lock = threading.Lock()
+
+class JsonFormatter(logging.Formatter):
+    """Formats records as one JSON object per line."""
+
+    def format(self, record):
+        entry = {
+            "time": self.formatTime(record, "%Y-%m-%d %H:%M:%S"),
+            "level": record.levelname,
+            "message": record.getMessage(),
+        }
+        for key in ("job_id", "file", "duration"):
+            value = getattr(record, key, None)
+            if value is not None:
+                entry[key] = value
+        if record.exc_text:
+            entry["traceback"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False)
+
+class StructuredQueueHandler(QueueHandler):
+    """QueueHandler that keeps the traceback separate from the message text."""
+
+    def prepare(self, record):
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+class SizeAndTimeRotatingFileHandler(RotatingFileHandler):
+    """Rotates when the file exceeds `maxBytes` or is older than `interval` seconds."""
+
+    def __init__(self, filename, maxBytes=DEFAULT_MAX_BYTES, backupCount=DEFAULT_BACKUP_COUNT, interval=DEFAULT_ROTATE_INTERVAL, encoding="utf-8"):
+        super().__init__(filename, maxBytes=maxBytes, backupCount=backupCount, encoding=encoding)
+        self.interval = interval
+        self.opened_at = time.time()
+
+    def shouldRollover(self, record):
+        if self.interval and time.time() - self.opened_at >= self.interval:
+            return True
+        return super().shouldRollover(record)
+
+    def doRollover(self):
+        super().doRollover()
+        self.opened_at = time.time()
+
+class RingBufferHandler(logging.Handler):
+    """Keeps the most recent formatted messages in memory for live display."""
+
+    def __init__(self, capacity=DEFAULT_RING_SIZE):
+        super().__init__()
+        self.entries = deque(maxlen=capacity)
+        self.sequence = 0
+        self.entries_lock = threading.Lock()
+
+    def emit(self, record):
+        try:
+            message = self.format(record)
+        except Exception:
+            self.handleError(record)
+            return
+        with self.entries_lock:
+            self.sequence += 1
+            self.entries.append((self.sequence, message))
+
+    def since(self, sequence):
+        """Return `(latest_sequence, messages)` for entries newer than `sequence`."""
+        with self.entries_lock:
+            return self.sequence, [message for (seq, message) in self.entries if seq > sequence]
+
+def setup_logging(log_dir="./logs", max_bytes=DEFAULT_MAX_BYTES, backup_count=DEFAULT_BACKUP_COUNT, rotate_interval=DEFAULT_ROTATE_INTERVAL, ring_size=DEFAULT_RING_SIZE):
+    """Route the img2pdf logger through a queue to a background listener thread.
+
+    The listener owns a single open log file (JSON lines, rotated by size and
+    age), the console output and the in-memory ring buffer. Callers only pay
+    for putting the record on the queue.
+    """
+    with _setup_lock:
+        if _listener is not None:
+            return _listener
+        return _start_listener(log_dir, max_bytes, backup_count, rotate_interval, ring_size)
+
+def _start_listener(log_dir, max_bytes, backup_count, rotate_interval, ring_size):
+    global _listener, _queue_handler, _ring_buffer
+
+    log_dir = pathlib.Path(log_dir)
+    log_dir.mkdir(parents=True, exist_ok=True)
+
+    text_formatter = logging.Formatter("[ %(asctime)s ] %(message)s", "%Y-%m-%d %H:%M:%S")
+
+    file_handler = SizeAndTimeRotatingFileHandler(log_dir / f"log_{session_date}.jsonl", max_bytes, backup_count, rotate_interval)
+    file_handler.setFormatter(JsonFormatter())
+
+    console_handler = logging.StreamHandler()
+    console_handler.setFormatter(text_formatter)
+
+    _ring_buffer = RingBufferHandler(ring_size)
+    _ring_buffer.setFormatter(text_formatter)
+
+    log_queue = queue.SimpleQueue()
+    _queue_handler = StructuredQueueHandler(log_queue)
+    logger.addHandler(_queue_handler)
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+
+    _listener = QueueListener(log_queue, file_handler, console_handler, _ring_buffer, respect_handler_level=True)
+    _listener.start()
+    atexit.register(shutdown_logging)
+
+    return _listener
+
+def shutdown_logging():
+    """Flush queued records and close the log file."""
+    global _listener, _queue_handler
+
+    if _listener is None:
+        return
+
+    logger.removeHandler(_queue_handler)
+    _queue_handler = None
+    _listener.stop()
+    for handler in _listener.handlers:
+        handler.close()
+    _listener = None
+
+def new_job_id():
+    return uuid.uuid4().hex[:8]
+
+def log(message, error=False, job_id=None, file=None, duration=None):
+    """Log a message; with `error=True` the active exception's traceback is attached."""
+    if _listener is None:
+        setup_logging()
+
+    extra = {"job_id": job_id, "file": None if file is None else str(file), "duration": None if duration is None else round(duration, 3)}
+
+    if error:
+        logger.error(message, exc_info=sys.exc_info()[0] is not None, extra=extra)
+    else:
+        logger.info(message, extra=extra)
+
+def recent_messages(sequence=0):
+    """Return `(latest_sequence, messages)` logged after `sequence`."""
+    if _ring_buffer is None:
+        return sequence, []
+    return _ring_buffer.since(sequence)
@@ -0,0 +1,206 @@
+from PyPDF2 import PdfReader, PdfWriter
+
+from concurrent.futures import ProcessPoolExecutor
+
+import argparse
+import os
+import pathlib
+import re
+import shutil
+import tempfile
+
+DEFAULT_CHUNK_SIZE = 64
+DEFAULT_MAX_OPEN_FILES = 32
+
+ORDERINGS = ("natural", "mtime", "manifest", "none")
+
+def natural_sort_key(path):
+    """Sort key that orders 'page2.pdf' before 'page10.pdf'."""
+    name = os.path.basename(str(path)).lower()
+    return [int(part) if part.isdigit() else part for part in re.split(r'(\d+)', name)]
+
+def parse_page_range(spec):
+    """Parse a 1-based page range like '1-3,5,8-' into a list of (start, stop) slices.
+
+    `stop` is exclusive and None means "until the last page".
+    """
+    if spec is None or str(spec).strip() == "":
+        return None
+
+    ranges = []
+    for part in str(spec).split(','):
+        part = part.strip()
+        if not part:
+            continue
+        match = re.fullmatch(r'(\d*)\s*-\s*(\d*)|(\d+)', part)
+        if match is None:
+            raise ValueError(f"Invalid page range: '{part}'")
+        if match.group(3):
+            page = int(match.group(3))
+            start, stop = page, page
+        else:
+            start = int(match.group(1)) if match.group(1) else 1
+            stop = int(match.group(2)) if match.group(2) else None
+        if start < 1 or (stop is not None and stop < start):
+            raise ValueError(f"Invalid page range: '{part}'")
+        ranges.append((start - 1, stop))
+
+    return ranges
+
+def _manifest_path(manifest_path, path):
+    path = pathlib.Path(path)
+    if not path.is_absolute():
+        path = manifest_path.parent / path
+    return path
+
+def read_manifest(manifest_path):
+    """Read a manifest file listing one PDF per line, optionally followed by a page range.
+
+    Blank lines and lines starting with '#' are ignored. Relative paths are resolved
+    against the manifest's directory.
+    """
+    manifest_path = pathlib.Path(manifest_path)
+    entries = []
+    with open(manifest_path, 'r', encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            # a trailing token made of digits, commas and dashes is a page range
+            match = re.fullmatch(r'(.+?)\s+([\d,\s-]+)', line)
+            if match and not _manifest_path(manifest_path, line).exists():
+                path, pages = match.group(1), match.group(2)
+            else:
+                path, pages = line, None
+            entries.append((str(_manifest_path(manifest_path, path)), parse_page_range(pages)))
+    return entries
+
+def order_pdfs(pdf_files, order="natural", key=None):
+    """Return `pdf_files` sorted by the given ordering rule.
+
+    `key` extracts the path from each item, e.g. for (path, page_ranges) tuples.
+    """
+    key = key or (lambda path: path)
+    if order == "natural":
+        return sorted(pdf_files, key=lambda item: natural_sort_key(key(item)))
+    elif order == "mtime":
+        return sorted(pdf_files, key=lambda item: (os.path.getmtime(key(item)), natural_sort_key(key(item))))
+    elif order in ("manifest", "none"):
+        return list(pdf_files)
+    raise ValueError(f"Unknown ordering '{order}', expected one of {ORDERINGS}")
+
+def _append_pages(writer, pdf_path, page_ranges):
+    reader = PdfReader(pdf_path)
+    page_count = len(reader.pages)
+
+    if page_ranges is None:
+        page_ranges = [(0, None)]
+
+    for start, stop in page_ranges:
+        stop = page_count if stop is None else min(stop, page_count)
+        for index in range(start, stop):
+            writer.add_page(reader.pages[index])
+
+def _merge_chunk(entries, output_path):
+    """Merge (path, page_ranges) entries into `output_path`.
+
+    Inputs are read one at a time, so a chunk never holds more than one open
+    input file handle.
+    """
+    writer = PdfWriter()
+    for pdf_path, page_ranges in entries:
+        _append_pages(writer, pdf_path, page_ranges)
+    with open(output_path, 'wb') as f:
+        writer.write(f)
+    writer.close()
+    return output_path
+
+def _chunks(items, size):
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+def merge_pdfs(entries, output_path, chunk_size=DEFAULT_CHUNK_SIZE, max_open_files=DEFAULT_MAX_OPEN_FILES, workers=None):
+    """Merge PDFs hierarchically.
+
+    `entries` is a list of paths or (path, page_ranges) tuples, already in the
+    desired order. Chunks of at most `chunk_size` inputs are merged by worker
+    processes into temporary PDFs, which are then combined level by level until
+    a single document remains. At most `max_open_files` chunks are in flight at
+    once, which bounds the number of open input files.
+    """
+    entries = [entry if isinstance(entry, tuple) else (str(entry), None) for entry in entries]
+    if not entries:
+        raise ValueError("No PDF files to merge.")
+
+    chunk_size = max(2, chunk_size)
+    workers = workers or os.cpu_count() or 1
+    workers = max(1, min(workers, max_open_files))
+
+    output_path = pathlib.Path(output_path)
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+
+    if len(entries) <= chunk_size:
+        _merge_chunk(entries, output_path)
+        return output_path
+
+    temp_dir = tempfile.mkdtemp(prefix="img2pdf_merge_", dir=output_path.parent)
+    try:
+        level = 0
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            while len(entries) > chunk_size:
+                chunk_paths = [
+                    os.path.join(temp_dir, f"level{level}_{i:06d}.pdf")
+                    for i in range(-(-len(entries) // chunk_size))
+                ]
+                merged = list(executor.map(_merge_chunk, _chunks(entries, chunk_size), chunk_paths))
+                entries = [(path, None) for path in merged]
+                level += 1
+
+        _merge_chunk(entries, output_path)
+    finally:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+
+    return output_path
+
+def collect_pdfs(inputs, order="natural", manifest=None, pages=None):
+    """Build the ordered (path, page_ranges) list from files, directories or a manifest."""
+    if manifest is not None:
+        entries = read_manifest(manifest)
+        if pages is not None:
+            default_ranges = parse_page_range(pages)
+            entries = [(path, ranges if ranges is not None else default_ranges) for path, ranges in entries]
+        return order_pdfs(entries, order, key=lambda entry: entry[0])
+
+    pdf_files = []
+    for item in inputs:
+        if os.path.isdir(item):
+            for root, _, files in os.walk(item):
+                for file in files:
+                    if file.lower().endswith('.pdf'):
+                        pdf_files.append(os.path.join(root, file))
+        else:
+            pdf_files.append(item)
+
+    page_ranges = parse_page_range(pages)
+    return [(path, page_ranges) for path in order_pdfs(pdf_files, order)]
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Merge PDF files into a single PDF.")
+    parser.add_argument("inputs", nargs="*", help="PDF files or directories containing PDF files.")
+    parser.add_argument("--output", type=str, help="Path of the merged PDF file.", default=pathlib.Path('./output/combined.pdf').resolve())
+    parser.add_argument("--manifest", type=str, help="Text file listing PDF files (and optional page ranges) in merge order.", default=None)
+    parser.add_argument("--order", choices=ORDERINGS, help="How to order the input files.", default=None)
+    parser.add_argument("--pages", type=str, help="Pages to take from each input, e.g. '1-3,5,8-'.", default=None)
+    parser.add_argument("--chunk_size", type=int, help="Number of files merged per worker task.", default=DEFAULT_CHUNK_SIZE)
+    parser.add_argument("--max_open_files", type=int, help="Upper bound on input files open at the same time.", default=DEFAULT_MAX_OPEN_FILES)
+    parser.add_argument("--workers", type=int, help="Number of worker processes.", default=None)
+
+    args = parser.parse_args()
+
+    if not args.inputs and not args.manifest:
+        parser.error("either input files or --manifest is required")
+
+    order = args.order or ("manifest" if args.manifest else "natural")
+    entries = collect_pdfs(args.inputs, order=order, manifest=args.manifest, pages=args.pages)
+    output_path = merge_pdfs(entries, args.output, chunk_size=args.chunk_size, max_open_files=args.max_open_files, workers=args.workers)
+    print(f"Merged {len(entries)} PDF files into: {output_path}")